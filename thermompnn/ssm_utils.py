@@ -1,13 +1,13 @@
+import mmap
 import os
-import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import numpy as np
-from Bio.PDB import PDBParser
 from omegaconf import OmegaConf
 from scipy.spatial.distance import cdist
 from thermompnn.train_thermompnn import parse_cfg
 from thermompnn.trainer.v2_trainer import TransferModelPLv2, TransferModelPLv2Siamese
-from tqdm import tqdm
 
 
 def get_model(mode, config):
@@ -28,9 +28,7 @@ def get_model(mode, config):
 
 def get_chains(pdb_file, chain_list):
     # collect list of chains in PDB to match with input
-    parser = PDBParser(QUIET=True)
-    structure = parser.get_structure("", pdb_file)
-    pdb_chains = [c.id for c in structure.get_chains()]
+    pdb_chains = pdb_chain_ids(pdb_file)
 
     if chain_list is None:  # fill in all chains if left blank
         chain_list = pdb_chains
@@ -45,178 +43,400 @@ def get_chains(pdb_file, chain_list):
     return chain_list
 
 
+_CFG_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+@lru_cache(maxsize=8)
+def load_config(path):
+    """Loads a YAML config once; callers must not modify the cached object."""
+    return OmegaConf.load(path)
+
+
 def get_config(mode):
     """Grabs relevant configs from disk."""
 
-    current_location = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-    local = os.path.join(os.path.join(current_location), "examples/configs/local.yaml")
+    local = os.path.join(_CFG_ROOT, "examples/configs/local.yaml")
 
     if mode == "single" or mode == "additive":
-        aux = os.path.join(
-            os.path.join(current_location), "examples/configs/single.yaml"
-        )
+        aux = os.path.join(_CFG_ROOT, "examples/configs/single.yaml")
 
     elif mode == "epistatic":
-        aux = os.path.join(
-            os.path.join(current_location), "examples/configs/epistatic.yaml"
-        )
+        aux = os.path.join(_CFG_ROOT, "examples/configs/epistatic.yaml")
     else:
         raise ValueError("Invalid mode selected!")
 
-    config = OmegaConf.merge(OmegaConf.load(local), OmegaConf.load(aux))
+    # merge copies the cached configs, so the returned config is safe to modify
+    config = OmegaConf.merge(load_config(local), load_config(aux))
 
     return parse_cfg(config)
 
 
-def get_dmat(pdb):
-    """Get LxL dmat from PDB"""
-
-    # get distance matrix
+def get_ca_coords(pdb):
+    """Get [L_total, 3] CA coordinates of all chains from PDB"""
     coords = [k for k in pdb.keys() if k.startswith("coords_chain_")]
-    # compile all-by-all coords into big matrix
     coo_all = []
     for coord in coords:
         ch = coord.split("_")[-1]
         coo = np.stack(pdb[coord][f"CA_chain_{ch}"])  # [L, 3]
         coo_all.append(coo)
-    coo_all = np.concatenate(coo_all)  # [L_total, 3]
+    return np.concatenate(coo_all)  # [L_total, 3]
+
+
+def get_dmat(pdb):
+    """Get LxL dmat from PDB"""
+
+    # compile all-by-all coords into big distance matrix
+    coo_all = get_ca_coords(pdb)
     dmat = cdist(coo_all, coo_all)
     return dmat
 
 
-def custom_parse_PDB_biounits(x, atoms=["N", "CA", "C"], chain=None):
+def pack_atom_names(names):
+    """Packs (stripped) atom names into uint32 codes for fast equality checks"""
+    return np.array(names, dtype="S4").view(np.uint32)
+
+
+# atom profiles extracted by custom_parse_PDB (tuples so they can key lookups)
+_CA_ATOMS = ("CA",)
+_BACKBONE_ATOMS = ("N", "CA", "C", "O")
+_SIDECHAIN_ATOMS = (
+    "N",
+    "CA",
+    "C",
+    "O",
+    "CB",
+    "CG",
+    "CG1",
+    "OG1",
+    "OG2",
+    "CG2",
+    "OG",
+    "SG",
+    "CD",
+    "SD",
+    "CD1",
+    "ND1",
+    "CD2",
+    "OD1",
+    "OD2",
+    "ND2",
+    "CE",
+    "CE1",
+    "NE1",
+    "OE1",
+    "NE2",
+    "OE2",
+    "NE",
+    "CE2",
+    "CE3",
+    "NZ",
+    "CZ",
+    "CZ2",
+    "CZ3",
+    "CH2",
+    "OH",
+    "NH1",
+    "NH2",
+)
+
+
+def atom_profile_lookup(atoms):
+    """Sorted packed atom codes of a profile and the slot each one maps to"""
+    codes = pack_atom_names(atoms)
+    order = np.argsort(codes)
+    return codes[order], order
+
+
+# lookups for the fixed profiles are built once at import
+_ATOM_PROFILE_LOOKUPS = {
+    atoms: atom_profile_lookup(atoms)
+    for atoms in [_CA_ATOMS, _BACKBONE_ATOMS, _SIDECHAIN_ATOMS]
+}
+
+
+def atom_slots(codes, atoms):
+    """Slot of each packed atom name within the atoms profile, -1 if absent"""
+    atoms = tuple(atoms)
+    if atoms in _ATOM_PROFILE_LOOKUPS:
+        sorted_codes, order = _ATOM_PROFILE_LOOKUPS[atoms]
+    else:
+        sorted_codes, order = atom_profile_lookup(atoms)
+    idx = np.searchsorted(sorted_codes, codes).clip(max=len(sorted_codes) - 1)
+    return np.where(sorted_codes[idx] == codes, order[idx], -1)
+
+
+def pdb_column(lines, start, stop):
+    """Slices fixed-width columns [start, stop) of PDB lines into a bytes array"""
+    return np.ascontiguousarray(lines[:, start:stop]).view(f"S{stop - start}").ravel()
+
+
+def residue_numbers(lines):
+    """
+    input:  lines = [N, 80] uint8 array of fixed-width ATOM records
+    output: int32 residue numbers and S1 insertion codes of columns 23-27
+
+    Like the old parser, a trailing letter is the insertion code and anything
+    else is part of the number, so 5-digit residue numbers that spill into
+    column 27 (common in MD exports) stay intact.
+    """
+    field = lines[:, 22:27].copy()  # [N, 5]
+    blank = (field == ord(" ")) | (field == 0)
+    last = field.shape[1] - 1 - np.argmax(~blank[:, ::-1], axis=1)  # last non-blank
+    rows = np.arange(field.shape[0])
+    tail = np.ascontiguousarray(field[rows, last]).view("S1")
+    is_ins = np.char.isalpha(tail)
+
+    field[rows[is_ins], last[is_ins]] = ord(" ")
+    num = np.ascontiguousarray(field).view("S5").ravel().astype(np.int32)
+    return num, np.where(is_ins, tail, b"")
+
+
+def tokenize_atom_records(lines):
+    """
+    input:  lines = [N, 80] uint8 array of fixed-width ATOM records
+    output: dict of per-atom arrays (structure of arrays)
+    """
+
+    # float64 like the Python floats of the old parser, so CA-CA distances
+    # (and their 2-decimal rounding) are unchanged
+    xyz = np.empty((lines.shape[0], 3), dtype=np.float64)
+    for n, i in enumerate([30, 38, 46]):
+        xyz[:, n] = pdb_column(lines, i, i + 8).astype(np.float64)
+    num, ins = residue_numbers(lines)
+
+    return {
+        "chain": np.ascontiguousarray(lines[:, 21]),
+        "atom": pack_atom_names(np.char.strip(pdb_column(lines, 12, 16))),
+        "resi": np.ascontiguousarray(lines[:, 17:20]),
+        "num": num,
+        "ins": ins,
+        "xyz": xyz,
+    }
+
+
+def coordinate_lines(buf, width=80):
+    """
+    input:  buf = uint8 array holding the raw PDB file
+    output: [N, width] uint8 array of its ATOM/HETATM lines, zero-padded
+    """
+    starts = np.concatenate([[0], np.flatnonzero(buf == ord("\n")) + 1])
+    ends = np.append(starts[1:] - 1, buf.shape[0])
+
+    def gather(starts, ends, width):
+        idx = starts[:, None] + np.arange(width)[None, :]
+        in_line = idx < ends[:, None]
+        lines = np.zeros(idx.shape, dtype=np.uint8)
+        lines[in_line] = buf[idx[in_line]]
+        return lines
+
+    record = pdb_column(gather(starts, ends, 6), 0, 6)
+    keep = np.char.startswith(record, b"ATOM") | (record == b"HETATM")
+    return gather(starts[keep], ends[keep], width)
+
+
+def read_coordinate_lines(x):
+    """
+    input:  x = PDB filename
+    output: [N, 80] uint8 array of its ATOM/HETATM lines (see coordinate_lines)
+    """
+    with open(x, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:  # mmap refuses empty files
+            return coordinate_lines(np.zeros(0, dtype=np.uint8))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            buf = np.frombuffer(mm, dtype=np.uint8)  # zero-copy view of the file
+            lines = coordinate_lines(buf)
+            del buf  # release the view so the map can close
+    return lines
+
+
+def pdb_chain_ids(pdb_file):
+    """Lists the chain ids of ATOM/HETATM records in order of first appearance"""
+    lines = read_coordinate_lines(pdb_file)
+    return [chr(c) for c in dict.fromkeys(lines[:, 21].tolist())]
+
+
+def normalize_residue_names(lines):
+    """Rewrites MSE/SEC records in place as ATOM MET/CYS (widths are unchanged)"""
+
+    def as_bytes(text):
+        return np.frombuffer(text, dtype=np.uint8)
+
+    resi = lines[:, 17:20]
+    is_mse = (resi == as_bytes(b"MSE")).all(-1)
+    is_sec = (resi == as_bytes(b"SEC")).all(-1)
+    is_het = (lines[:, :6] == as_bytes(b"HETATM")).all(-1)
+    lines[is_mse & is_het, :6] = as_bytes(b"ATOM  ")
+    resi[is_mse] = as_bytes(b"MET")
+    resi[is_sec] = as_bytes(b"CYS")
+
+
+def read_pdb_records(x):
     """
     input:  x = PDB filename
+    output: dict of per-atom arrays for all ATOM records (see tokenize_atom_records)
+    """
+    lines = read_coordinate_lines(x)
+    normalize_residue_names(lines)
+    is_atom = (lines[:, :4] == np.frombuffer(b"ATOM", dtype=np.uint8)).all(-1)
+    return tokenize_atom_records(lines[is_atom])
+
+
+# residue labels of a parsed chain: PDB residue number and insertion code
+RESN_DTYPE = np.dtype([("num", "i4"), ("ins", "S1")])
+
+# lookup tables between 1-letter amino acid bytes and integer tokens
+_ALPHA_1 = np.frombuffer(b"ARNDCQEGHILKMFPSTWYV-", dtype=np.uint8)
+_AA1_TO_N = np.full(256, len(_ALPHA_1) - 1, dtype=np.int8)
+_AA1_TO_N[_ALPHA_1] = np.arange(len(_ALPHA_1))
+_N_TO_AA1 = _ALPHA_1.view("S1")
+
+# 3-letter residue names -> integer tokens, indexed by each letter's offset from "A"
+_ALPHA_3 = [
+    "ALA",
+    "ARG",
+    "ASN",
+    "ASP",
+    "CYS",
+    "GLN",
+    "GLU",
+    "GLY",
+    "HIS",
+    "ILE",
+    "LEU",
+    "LYS",
+    "MET",
+    "PHE",
+    "PRO",
+    "SER",
+    "THR",
+    "TRP",
+    "TYR",
+    "VAL",
+    "GAP",
+]
+_AA3_IDX = np.frombuffer("".join(_ALPHA_3).encode(), dtype=np.uint8) - ord("A")
+_AA3_TO_N = np.full((26, 26, 26), len(_ALPHA_3) - 1, dtype=np.int8)
+_AA3_TO_N[tuple(_AA3_IDX.reshape(-1, 3).T)] = np.arange(len(_ALPHA_3))
+
+
+def AA_to_N(x):
+    # ["ARND"] -> [[0,1,2,3]]
+    x = np.array(x)
+    if x.ndim == 0:
+        x = x[None]
+    return [_AA1_TO_N[np.frombuffer(y.encode(), dtype=np.uint8)].tolist() for y in x]
+
+
+def AA3_to_N(x):
+    # ["ALA", "GLY"] as [N, 3] uint8 -> [0, 7], unknown residues -> gap
+    idx = x.astype(np.int64) - ord("A")
+    known = ((idx >= 0) & (idx < 26)).all(-1)
+    idx = np.where(known[:, None], idx, 0)
+    return np.where(
+        known, _AA3_TO_N[idx[:, 0], idx[:, 1], idx[:, 2]], len(_ALPHA_3) - 1
+    )
+
+
+def N_to_AA(x):
+    # [[0,1,2,3]] -> ["ARND"]
+    x = np.array(x)
+    if x.ndim == 1:
+        x = x[None]
+    x = np.where((x >= 0) & (x < len(_N_TO_AA1)), x, len(_N_TO_AA1) - 1)
+    return [_N_TO_AA1[y].tobytes().decode() for y in x]
+
+
+def custom_parse_PDB_biounits(x, atoms=("N", "CA", "C"), chain=None):
+    """
+    input:  x = PDB filename or records from read_pdb_records
             atoms = atoms to extract (optional)
-    output: (length, atoms, coords=(x,y,z)), sequence
+    output: (length, atoms, coords=(x,y,z)), sequence, residue labels (RESN_DTYPE),
+            or None if the chain has no ATOM records
     """
 
-    alpha_1 = list("ARNDCQEGHILKMFPSTWYV-")
-    states = len(alpha_1)
-    alpha_3 = [
-        "ALA",
-        "ARG",
-        "ASN",
-        "ASP",
-        "CYS",
-        "GLN",
-        "GLU",
-        "GLY",
-        "HIS",
-        "ILE",
-        "LEU",
-        "LYS",
-        "MET",
-        "PHE",
-        "PRO",
-        "SER",
-        "THR",
-        "TRP",
-        "TYR",
-        "VAL",
-        "GAP",
-    ]
+    records = x if isinstance(x, dict) else read_pdb_records(x)
+    if chain is not None:
+        in_chain = records["chain"].view("S1") == chain.encode()
+        records = {k: v[in_chain] for k, v in records.items()}
+
+    if len(records["num"]) == 0:  # chain not in the PDB
+        return None
 
-    aa_1_N = {a: n for n, a in enumerate(alpha_1)}
-    aa_3_N = {a: n for n, a in enumerate(alpha_3)}
-    aa_N_1 = {n: a for n, a in enumerate(alpha_1)}
-    aa_1_3 = {a: b for a, b in zip(alpha_1, alpha_3)}
-    aa_3_1 = {b: a for a, b in zip(alpha_1, alpha_3)}
-
-    def AA_to_N(x):
-        # ["ARND"] -> [[0,1,2,3]]
-        x = np.array(x)
-        if x.ndim == 0:
-            x = x[None]
-        return [[aa_1_N.get(a, states - 1) for a in y] for y in x]
-
-    def N_to_AA(x):
-        # [[0,1,2,3]] -> ["ARND"]
-        x = np.array(x)
-        if x.ndim == 1:
-            x = x[None]
-        return ["".join([aa_N_1.get(a, "-") for a in y]) for y in x]
-
-    xyz, seq, min_resn, max_resn = {}, {}, 1e6, -1e6
-    resn_list = []
-    for line in open(x, "rb"):
-        line = line.decode("utf-8", "ignore").rstrip()
-
-        # handling MSE and SEC residues
-        if line[:6] == "HETATM" and line[17 : 17 + 3] == "MSE":
-            line = line.replace("HETATM", "ATOM  ")
-            line = line.replace("MSE", "MET")
-        elif line[17 : 17 + 3] == "MSE":
-            line = line.replace("MSE", "MET")
-        elif line[17 : 17 + 3] == "SEC":
-            line = line.replace("SEC", "CYS")
-
-        if line[:4] == "ATOM":
-            ch = line[21:22]
-            if ch == chain or chain is None:
-                atom = line[12 : 12 + 4].strip()
-                resi = line[17 : 17 + 3]
-                resn = line[22 : 22 + 5].strip()
-
-                # Check for gaps and add them if needed
-                if (resn not in resn_list) and len(resn_list) > 0:
-                    _, num, ins_code = re.split(r"(\d+)", resn)
-                    _, num_prior, ins_code_prior = re.split(r"(\d+)", resn_list[-1])
-                    gap = int(num) - int(num_prior) - 1
-                    for g in range(gap + 1):
-                        resn_list.append(str(int(num_prior) + g))
-
-                # RAW resn is defined HERE
-                resn_list.append(resn)  # NEED to keep ins code here
-
-                x, y, z = [float(line[i : (i + 8)]) for i in [30, 38, 46]]
-                if resn[-1].isalpha():
-                    resa, resn = resn[-1], int(resn[:-1]) - 1
-                else:
-                    resa, resn = "", int(resn) - 1
-                if resn < min_resn:
-                    min_resn = resn
-                if resn > max_resn:
-                    max_resn = resn
-                if resn not in xyz:
-                    xyz[resn] = {}
-                if resa not in xyz[resn]:
-                    xyz[resn][resa] = {}
-                if resn not in seq:
-                    seq[resn] = {}
-                if resa not in seq[resn]:
-                    seq[resn][resa] = resi
-
-                if atom not in xyz[resn][resa]:
-                    xyz[resn][resa][atom] = np.array([x, y, z])
+    # atom slot of each record in the output array, -1 for atoms not extracted
+    slot = atom_slots(records["atom"], atoms)
+    ins_codes, ins_idx = np.unique(records["ins"], return_inverse=True)
 
     # convert to numpy arrays, fill in missing values
-    seq_, xyz_ = [], []
-    try:
-        for resn in range(min_resn, max_resn + 1):
-            if resn in seq:
-                for k in sorted(seq[resn]):
-                    seq_.append(aa_3_N.get(seq[resn][k], 20))
-            else:
-                seq_.append(20)
-
-            if resn in xyz:
-                for k in sorted(xyz[resn]):
-                    for atom in atoms:
-                        if atom in xyz[resn][k]:
-                            xyz_.append(xyz[resn][k][atom])
-                        else:
-                            xyz_.append(np.full(3, np.nan))
-            else:
-                for atom in atoms:
-                    xyz_.append(np.full(3, np.nan))
-        return (
-            np.array(xyz_).reshape(-1, len(atoms), 3),
-            N_to_AA(np.array(seq_)),
-            list(dict.fromkeys(resn_list)),
+    resn = records["num"] - 1
+    min_resn, max_resn = resn.min(), resn.max()
+
+    # one row per observed (resn, insertion code) in sorted order, plus one
+    # gap row per missing resn between min_resn and max_resn
+    res_keys, res_first, res_of_record = np.unique(
+        (resn - min_resn) * len(ins_codes) + ins_idx,
+        return_index=True,
+        return_inverse=True,
+    )
+    # res_keys is sorted, so the rank of each resn among the observed ones
+    # falls out of a running count of changes (no second sort)
+    res_resn = res_keys // len(ins_codes)
+    resn_rank = np.cumsum(np.diff(res_resn, prepend=res_resn[0]) != 0)
+    row_of_res = np.arange(len(res_keys)) + res_resn - resn_rank
+    n_rows = row_of_res[-1] + 1
+
+    seq_ = np.full(n_rows, 20)
+    seq_[row_of_res] = AA3_to_N(records["resi"][res_first])
+
+    # label observed rows with their (resn, insertion code); gap rows count up
+    # from the last observed row and carry no insertion code
+    observed = np.zeros(n_rows, dtype=bool)
+    observed[row_of_res] = True
+    row_num = np.zeros(n_rows, dtype=np.int32)
+    row_num[row_of_res] = res_resn + min_resn + 1
+    last = np.maximum.accumulate(np.where(observed, np.arange(n_rows), 0))
+    resn_list = np.zeros(n_rows, dtype=RESN_DTYPE)
+    resn_list["num"] = row_num[last] + np.arange(n_rows) - last
+    resn_list["ins"][row_of_res] = ins_codes[res_keys % len(ins_codes)]
+
+    # scatter coordinates into [L, atoms, 3], keeping the first record of each atom
+    rows = row_of_res[res_of_record]
+    flat, first = np.unique((rows * len(atoms) + slot)[slot >= 0], return_index=True)
+    xyz_ = np.full((n_rows * len(atoms), 3), np.nan, dtype=np.float64)
+    xyz_[flat] = records["xyz"][slot >= 0][first]
+    return (
+        xyz_.reshape(-1, len(atoms), 3),
+        N_to_AA(seq_),
+        resn_list,
+    )
+
+
+def parse_all_chains(x, atoms=("N", "CA", "C"), chain_list=None):
+    """
+    input:  x = PDB filename or records from read_pdb_records
+            atoms = atoms to extract (optional)
+            chain_list = chain ids to parse (optional, default all)
+    output: {chain: ((length, atoms, coords=(x,y,z)), sequence, residue labels)}
+    """
+    records = x if isinstance(x, dict) else read_pdb_records(x)
+    chains = list(dict.fromkeys(records["chain"].tolist()))
+    if chain_list is not None:  # skip chains nobody asked for
+        chains = [chain for chain in chains if chr(chain) in chain_list]
+
+    def parse_chain(chain):
+        in_chain = records["chain"] == chain
+        return custom_parse_PDB_biounits(
+            {k: v[in_chain] for k, v in records.items()}, atoms=atoms
         )
-    except TypeError:
-        return "no_chain", "no_chain", "no_chain"
+
+    # chains share the parsed records and are independent of each other; the
+    # numpy work releases the GIL, so threads pay off on multi-chain complexes
+    workers = min(len(chains), os.cpu_count() or 1)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_chain, chains))
+    else:
+        results = [parse_chain(chain) for chain in chains]
+    return {chr(chain): result for chain, result in zip(chains, results)}
 
 
 def custom_parse_PDB(
@@ -295,78 +515,41 @@ def custom_parse_PDB(
         concat_O = []
         concat_mask = []
         coords_dict = {}
+        if ca_only:
+            sidechain_atoms = _CA_ATOMS
+        elif side_chains:
+            sidechain_atoms = _SIDECHAIN_ATOMS
+        else:
+            sidechain_atoms = _BACKBONE_ATOMS
+        parsed = parse_all_chains(
+            biounit, atoms=sidechain_atoms, chain_list=input_chain_list or None
+        )
         for letter in chain_alphabet:
+            if parsed.get(letter) is None:
+                continue
+            xyz, seq, resn_list = parsed[letter]
+            my_dict["resn_list_" + letter] = resn_list
+            concat_seq += seq[0]
+            my_dict["seq_chain_" + letter] = seq[0]
+            coords_dict_chain = {}
+            coords = np.ascontiguousarray(xyz.swapaxes(0, 1))  # [atoms, L, 3]
             if ca_only:
-                sidechain_atoms = ["CA"]
+                coords_dict_chain["CA_chain_" + letter] = xyz
             elif side_chains:
-                sidechain_atoms = [
-                    "N",
-                    "CA",
-                    "C",
-                    "O",
-                    "CB",
-                    "CG",
-                    "CG1",
-                    "OG1",
-                    "OG2",
-                    "CG2",
-                    "OG",
-                    "SG",
-                    "CD",
-                    "SD",
-                    "CD1",
-                    "ND1",
-                    "CD2",
-                    "OD1",
-                    "OD2",
-                    "ND2",
-                    "CE",
-                    "CE1",
-                    "NE1",
-                    "OE1",
-                    "NE2",
-                    "OE2",
-                    "NE",
-                    "CE2",
-                    "CE3",
-                    "NZ",
-                    "CZ",
-                    "CZ2",
-                    "CZ3",
-                    "CH2",
-                    "OH",
-                    "NH1",
-                    "NH2",
-                ]
+                coords_dict_chain["N_chain_" + letter] = coords[0]
+                coords_dict_chain["CA_chain_" + letter] = coords[1]
+                coords_dict_chain["C_chain_" + letter] = coords[2]
+                coords_dict_chain["O_chain_" + letter] = coords[3]
+                coords_dict_chain["SG_chain_" + letter] = coords[11]
             else:
-                sidechain_atoms = ["N", "CA", "C", "O"]
-            xyz, seq, resn_list = custom_parse_PDB_biounits(
-                biounit, atoms=sidechain_atoms, chain=letter
-            )
-            if resn_list != "no_chain":
-                my_dict["resn_list_" + letter] = resn_list
-            if type(xyz) != str:
-                concat_seq += seq[0]
-                my_dict["seq_chain_" + letter] = seq[0]
-                coords_dict_chain = {}
-                if ca_only:
-                    coords_dict_chain["CA_chain_" + letter] = xyz.tolist()
-                elif side_chains:
-                    coords_dict_chain["N_chain_" + letter] = xyz[:, 0, :].tolist()
-                    coords_dict_chain["CA_chain_" + letter] = xyz[:, 1, :].tolist()
-                    coords_dict_chain["C_chain_" + letter] = xyz[:, 2, :].tolist()
-                    coords_dict_chain["O_chain_" + letter] = xyz[:, 3, :].tolist()
-                    coords_dict_chain["SG_chain_" + letter] = xyz[:, 11].tolist()
-                else:
-                    coords_dict_chain["N_chain_" + letter] = xyz[:, 0, :].tolist()
-                    coords_dict_chain["CA_chain_" + letter] = xyz[:, 1, :].tolist()
-                    coords_dict_chain["C_chain_" + letter] = xyz[:, 2, :].tolist()
-                    coords_dict_chain["O_chain_" + letter] = xyz[:, 3, :].tolist()
-                my_dict["coords_chain_" + letter] = coords_dict_chain
-                s += 1
-
-        fi = biounit.rfind("/")
-        my_dict["name"] = biounit[(fi + 1) : -4]
+                coords_dict_chain["N_chain_" + letter] = coords[0]
+                coords_dict_chain["CA_chain_" + letter] = coords[1]
+                coords_dict_chain["C_chain_" + letter] = coords[2]
+                coords_dict_chain["O_chain_" + letter] = coords[3]
+            my_dict["coords_chain_" + letter] = coords_dict_chain
+            s += 1
+
+        my_dict["name"] = os.path.splitext(os.path.basename(biounit))[0]
         my_dict["num_of_chains"] = s
         my_dict["seq"] = concat_seq
         if s <= len(chain_alphabet):
@@ -379,36 +562,36 @@ def idx_to_pdb_num(pdb, poslist):
     # set up PDB resns and boundaries
     chains = [key[-1] for key in pdb.keys() if key.startswith("resn_list_")]
     resn_lists = [pdb[key] for key in pdb.keys() if key.startswith("resn_list")]
-    converter = {}
-    offset = 0
-    for n, rlist in enumerate(resn_lists):
-        chain = chains[n]
-        for idx, resid in enumerate(rlist):
-            converter[idx + offset] = chain + resid
-        offset += idx + 1
+    offsets = np.cumsum([0] + [len(rlist) for rlist in resn_lists])
+
+    # find the chain of each position from the chain start offsets
+    poslist = np.asarray(poslist, dtype=np.int64)
+    chain_idx = np.searchsorted(offsets, poslist, side="right") - 1
+    picked = np.empty(len(poslist), dtype=RESN_DTYPE)
+    for c in np.unique(chain_idx).tolist():
+        in_chain = chain_idx == c
+        picked[in_chain] = resn_lists[c][poslist[in_chain] - offsets[c]]
 
-    return [converter[pos] for pos in poslist]
+    # format only the requested positions as e.g. "A52" / "A52A"
+    resn = np.char.add(picked["num"].astype("U"), picked["ins"].astype("U"))
+    return np.char.add(np.asarray(chains)[chain_idx], resn).tolist()
 
 
 def distance_filter(df, pdb, distance=5.0):
     """filter df based on pdb distances"""
-    dmat = get_dmat(pdb)
+    coo_all = get_ca_coords(pdb)
 
     # grab positions
     df[["mut1", "mut2"]] = df["Mutation"].str.split(":", n=2, expand=True)
     df["pos1"] = df["mut1"].str[1:-1].astype(int) - 1
     df["pos2"] = df["mut2"].str[1:-1].astype(int) - 1
 
-    # filter df based on positions
+    # filter df based on positions, computing only the distances of listed pairs
     pos1, pos2 = df["pos1"].values, df["pos2"].values
-    dist_list = []
-    for p1, p2 in tqdm(zip(pos1, pos2)):
-        dist_list.append(dmat[p1, p2])
+    dist = np.linalg.norm(coo_all[pos1] - coo_all[pos2], axis=-1)
 
-    df["CA-CA Distance"] = dist_list
-    mask = (df["CA-CA Distance"] <= distance) & (df["CA-CA Distance"] != 0.0)
-    df = df.loc[mask]
-    df.loc[:, "CA-CA Distance"] = df["CA-CA Distance"].round(2)
+    df["CA-CA Distance"] = np.round(dist, 2)
+    df = df.loc[(dist <= distance) & (dist != 0.0)]
 
     df = df[["ddG (kcal/mol)", "Mutation", "CA-CA Distance"]].reset_index(drop=True)
     print("Distance matrix generated.")
@@ -418,38 +601,24 @@ def distance_filter(df, pdb, distance=5.0):
 def renumber_pdb(df, pdb, mode):
     """Renumber output mutations to match PDB numbering for interpretation"""
 
-    if (mode.lower() == "additive") or (mode.lower() == "epistatic"):
-        # grab positions
-        df[["mut1", "mut2"]] = df["Mutation"].str.split(":", n=2, expand=True)
-        df["pos1"] = df["mut1"].str[1:-1].astype(int) - 1
-        df["pos2"] = df["mut2"].str[1:-1].astype(int) - 1
+    def renumber(muts):
+        # e.g. A12C -> A52AC, with one idx_to_pdb_num lookup for the whole column
+        pos = idx_to_pdb_num(pdb, muts.str[1:-1].astype(int).values - 1)
+        wt = muts.str[0].values.astype(str)
+        mt = muts.str[-1].values.astype(str)
+        return np.char.add(np.char.add(wt, pos), mt)
 
-        df["pos1"] = idx_to_pdb_num(pdb, df["pos1"].values)
-        df["pos2"] = idx_to_pdb_num(pdb, df["pos2"].values)
-
-        df["wt1"], df["wt2"] = df["mut1"].str[0], df["mut2"].str[0]
-        df["mt1"], df["mt2"] = df["mut1"].str[-1], df["mut2"].str[-1]
+    if (mode.lower() == "additive") or (mode.lower() == "epistatic"):
+        # grab positions of both mutations, row by row
+        muts = df["Mutation"].str.split(":", n=2, expand=True).stack()
+        muts = renumber(muts).reshape(-1, 2)
 
-        df["Mutation"] = (
-            df["wt1"]
-            + df["pos1"]
-            + df["mt1"]
-            + ":"
-            + df["wt2"]
-            + df["pos2"]
-            + df["mt2"]
-        )
+        df["Mutation"] = np.char.add(np.char.add(muts[:, 0], ":"), muts[:, 1])
         df = df[["ddG (kcal/mol)", "Mutation", "CA-CA Distance"]].reset_index(drop=True)
 
     else:
         # grab position
-        df["pos"] = df["Mutation"].str[1:-1].astype(int) - 1
-
-        df["pos"] = idx_to_pdb_num(pdb, df["pos"].values)
-        df["wt"] = df["Mutation"].str[0]
-        df["mt"] = df["Mutation"].str[-1]
-
-        df["Mutation"] = df["wt"] + df["pos"] + df["mt"]
+        df["Mutation"] = renumber(df["Mutation"])
         df = df[["ddG (kcal/mol)", "Mutation"]].reset_index(drop=True)
 
     print("ThermoMPNN predictions renumbered.")
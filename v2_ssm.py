@@ -1,6 +1,7 @@
 import argparse
 import os
 import time
+from contextlib import nullcontext
 
 import numpy as np
 import pandas as pd
@@ -17,140 +18,96 @@ from thermompnn.ssm_utils import (
     load_pdb,
     renumber_pdb,
 )
-from torch.utils.data import DataLoader
 from tqdm import tqdm
 
 
 def get_ssm_mutations_double(pdb, dthresh):
     # make mutation list for SSM run
     ALPHABET = "ACDEFGHIKLMNPQRSTVWYX"
-    MUT_POS, MUT_WT = [], []
-    for seq_pos in range(len(pdb["seq"])):
-        wtAA = pdb["seq"][seq_pos]
-        # check for missing residues
-        if wtAA != "-":
-            MUT_POS.append(seq_pos)
-            MUT_WT.append(wtAA)
-        else:
-            MUT_WT.append("-")
+    wt = np.array([ALPHABET.find(aa) for aa in pdb["seq"]])  # [L], -1 if missing
 
     # Use distance filter BEFORE data setup / inference for speedup
-    from thermompnn.ssm_utils import get_dmat
-
     dmat = np.triu(get_dmat(pdb))  # [L, L]
     mask = (dmat < dthresh) & (dmat > 0.0)
-    pos1, pos2 = np.where(mask)
-    pos_combos = [(p1, p2) for p1, p2 in zip(pos1, pos2)]
-    pos_combos = np.array(pos_combos)  # [combos, 2]
-    wtAA = np.zeros_like(pos_combos)
-    # fill in wtAA for each pos combo
-    for p_idx in range(pos_combos.shape[0]):
-        wtAA[p_idx, 0] = ALPHABET.index(MUT_WT[pos_combos[p_idx, 0]])
-        wtAA[p_idx, 1] = ALPHABET.index(MUT_WT[pos_combos[p_idx, 1]])
-
-    # make default mutAA bundle for broadcasting
-    one = np.arange(20).repeat(20)
-    two = np.tile(np.arange(20), 20)
-    mutAA = np.stack([one, two]).T  # [400, 2]
-    n_comb = pos_combos.shape[0]
-    mutAA = np.tile(mutAA, (n_comb, 1))
+    mask &= (wt >= 0)[:, None] & (wt >= 0)[None, :]  # check for missing residues
+    pos_combos = np.stack(np.nonzero(mask), axis=-1)  # [combos, 2], p1 < p2
+    wtAA = wt[pos_combos]  # [combos, 2]
 
-    # the problem is 2nd wtAA/pos_combos and 2nd mutAA are correlated so they always show up together
-    # repeat these 20x20 times
-    wtAA = np.repeat(wtAA, 400, axis=0)
-    pos_combos = np.repeat(pos_combos, 400, axis=0)
+    # allowed mutAA for each wtAA token: the 19 other amino acids, in order
+    others = np.arange(19)[None, :]
+    allowed = others + (others >= np.arange(20)[:, None])  # [20, 19]
+    mut1 = allowed[wtAA[:, 0]]  # [combos, 19]
+    mut2 = allowed[wtAA[:, 1]]  # [combos, 19]
 
-    # filter out self-mutations and single-mutations
-    mask = np.sum(mutAA == wtAA, -1).astype(bool)
-    pos_combos = pos_combos[~mask, :]
-    mutAA = mutAA[~mask, :]
-    wtAA = wtAA[~mask, :]
+    # emit only the 19 x 19 double mutants of each pos combo, skipping self-mutations
+    n_comb = pos_combos.shape[0]
+    mut1 = np.broadcast_to(mut1[:, :, None], (n_comb, 19, 19))
+    mut2 = np.broadcast_to(mut2[:, None, :], (n_comb, 19, 19))
+    mutAA = np.stack([mut1, mut2], -1).reshape(-1, 2)  # [combos * 361, 2]
+
+    # compact index dtypes: positions fit in int32 and amino acid tokens in int8
+    return (
+        torch.from_numpy(np.repeat(pos_combos, 361, axis=0).astype(np.int32)),
+        torch.from_numpy(np.repeat(wtAA, 361, axis=0).astype(np.int8)),
+        torch.from_numpy(mutAA.astype(np.int8)),
+    )
 
-    # filter out upper-triangle portions - if mutAA or pos is larger, it's already been checked
-    mask = pos_combos[:, 0] > pos_combos[:, 1]
-    pos_combos = pos_combos[~mask, :]
-    mutAA = mutAA[~mask, :]
-    wtAA = wtAA[~mask, :]
 
-    return torch.tensor(pos_combos), torch.tensor(wtAA), torch.tensor(mutAA)
+def head_autocast_dtype(device="cuda"):
+    """Half-precision dtype for the stability head: bfloat16 where the GPU supports it, else float16"""
+    bf16 = device != "cuda" or torch.cuda.is_bf16_supported()
+    return torch.bfloat16 if bf16 else torch.float16
 
 
+@torch.inference_mode()
 def run_double(
-    all_mpnn_hid, mpnn_embed, cfg, loader, batch_size, model, X, mask, mpnn_edges_raw
+    all_mpnn_hid,
+    mpnn_embed,
+    cfg,
+    loader,
+    batch_size,
+    model,
+    E_idx,
+    mpnn_edges_raw,
+    compile=False,
+    half=False,
 ):
     """Batched mutation processing using shared protein embeddings and only stability prediction module head"""
     device = "cuda"
+    # shared protein embeddings stay [1, L, ...]; each batch gathers only its positions
     all_mpnn_hid = torch.cat(all_mpnn_hid[: cfg.model.num_final_layers], -1)
-    all_mpnn_hid = all_mpnn_hid.repeat(batch_size, 1, 1)
-    mpnn_embed = mpnn_embed.repeat(batch_size, 1, 1)
-    mpnn_edges_raw = mpnn_edges_raw.repeat(batch_size, 1, 1, 1)
-    # get edges between the two mutated residues
-    D_n, E_idx = _dist(X[:, :, 1, :], mask)
-    E_idx = E_idx.repeat(batch_size, 1, 1)
+    all_mpnn_hid = torch.squeeze(all_mpnn_hid, 0)  # [L, E * nfl]
+    mpnn_embed = torch.squeeze(mpnn_embed, 0)  # [L, E]
 
-    preds = []
-    for b in tqdm(loader):
-        pos, wtAA, mutAA = b
-        pos = pos.to(device)
-        wtAA = wtAA.to(device)
-        mutAA = mutAA.to(device)
-        mut_mutant_AAs = mutAA
-        mut_positions = pos
-        REAL_batch_size = mutAA.shape[0]
-
-        # get sequence embedding for mutant aa
-        mut_embed_list = []
-        for m in range(mut_mutant_AAs.shape[-1]):
-            mut_embed_list.append(model.prot_mpnn.W_s(mut_mutant_AAs[:, m]))
-        mut_embed = torch.cat(
-            [m.unsqueeze(-1) for m in mut_embed_list], -1
-        )  # shape: (Batch, Embed, N_muts)
+    # only 21 possible tokens, so look mutant embeddings up in the weight table directly
+    W_s_table = model.prot_mpnn.W_s.weight.detach()  # [21, E]
+
+    # resolved here, since querying the GPU inside predict_batch breaks the compiled graph
+    half_dtype = head_autocast_dtype(device) if half else None
+
+    def predict_batch(mut_positions, mut_mutant_AAs):
+        # get sequence embedding for mutant aa, shape: (Batch, Embed, N_muts)
+        mut_embed = W_s_table[mut_mutant_AAs.long()].permute(0, 2, 1)
 
         n_mutations = [0, 1]
         edges = []
         for n_current in n_mutations:  # iterate over N-order mutations
             # select the edges at the current mutated positions
-            if (
-                REAL_batch_size != mpnn_edges_raw.shape[0]
-            ):  # last batch will throw error if not corrected
-                mpnn_edges_raw = mpnn_edges_raw[:REAL_batch_size, ...]
-                E_idx = E_idx[:REAL_batch_size, ...]
-                all_mpnn_hid = all_mpnn_hid[:REAL_batch_size, ...]
-                mpnn_embed = mpnn_embed[:REAL_batch_size, ...]
-
-            mpnn_edges_tmp = torch.squeeze(
-                batched_index_select(
-                    mpnn_edges_raw, 1, mut_positions[:, n_current : n_current + 1]
-                ),
-                1,
-            )
-            E_idx_tmp = torch.squeeze(
-                batched_index_select(
-                    E_idx, 1, mut_positions[:, n_current : n_current + 1]
-                ),
-                1,
-            )
+            current_positions = mut_positions[:, n_current]  # [B]
+            mpnn_edges_tmp = mpnn_edges_raw[0].index_select(0, current_positions)
+            E_idx_tmp = E_idx[0].index_select(0, current_positions)  # [B, K]
 
             n_other = [a for a in n_mutations if a != n_current]
             mp_other = mut_positions[:, n_other]  # [B, 1]
             # E_idx_tmp [B, K]
-            mp_other = mp_other[..., None].repeat(
-                1, 1, E_idx_tmp.shape[-1]
-            )  # [B, 1, 48]
-            idx = torch.where(
-                E_idx_tmp[:, None, :] == mp_other
-            )  # get indices where the neighbor list matches the mutations we want
-            a, b, c = idx
-            # start w/empty edges and fill in as you go, then set remaining edges to 0
-            edge = torch.full(
-                [REAL_batch_size, mpnn_edges_tmp.shape[-1]],
-                torch.nan,
-                device=E_idx.device,
-            )  # [B, 128]
-            # idx is (a, b, c) tuple of tensors
-            # a has indices of batch members; b is all 0s; c has indices of actual neighbors for edge grabbing
-            edge[a, :] = mpnn_edges_tmp[a, c, :]
-            edge = torch.nan_to_num(edge, nan=0)
+            # find where the neighbor list matches the mutations we want
+            match = E_idx_tmp == mp_other  # [B, K]
+            has = match.any(-1, keepdim=True)  # [B, 1]
+            k_idx = match.float().argmax(-1, keepdim=True)  # [B, 1]
+            # gather the matching edge, then zero out members with no such neighbor
+            k_idx = k_idx.unsqueeze(-1).expand(-1, 1, mpnn_edges_tmp.size(-1))
+            edge = mpnn_edges_tmp.gather(1, k_idx).squeeze(1)  # [B, 128]
+            edge.masked_fill_(~has, 0.0)
             edges.append(edge)
 
         mpnn_edges = torch.stack(
@@ -161,32 +118,12 @@ def run_double(
         final_embed = []
         for i in range(mut_mutant_AAs.shape[-1]):
             # gather embedding for a specific position
-            current_positions = mut_positions[:, i : i + 1]  # [B, 1]
-            g_struct_embed = torch.gather(
-                all_mpnn_hid,
-                1,
-                current_positions.unsqueeze(-1).expand(
-                    current_positions.size(0),
-                    current_positions.size(1),
-                    all_mpnn_hid.size(2),
-                ),
-            )
-            g_struct_embed = torch.squeeze(g_struct_embed, 1)  # [B, E * nfl]
+            current_positions = mut_positions[:, i]  # [B]
+            g_struct_embed = all_mpnn_hid.index_select(0, current_positions)
             # add specific mutant embedding to gathered embed based on which mutation is being gathered
-            g_seq_embed = torch.gather(
-                mpnn_embed,
-                1,
-                current_positions.unsqueeze(-1).expand(
-                    current_positions.size(0),
-                    current_positions.size(1),
-                    mpnn_embed.size(2),
-                ),
-            )
-            g_seq_embed = torch.squeeze(g_seq_embed, 1)  # [B, E]
+            g_seq_embed = mpnn_embed.index_select(0, current_positions)  # [B, E]
             # if mut embed enabled, subtract it from the wt embed directly to keep dims low
             if cfg.model.mutant_embedding:
-                if REAL_batch_size != mut_embed.shape[0]:
-                    mut_embed = mut_embed[:REAL_batch_size, ...]
                 g_seq_embed = g_seq_embed - mut_embed[:, :, i]  # [B, E]
             g_embed = torch.cat([g_struct_embed, g_seq_embed], -1)  # [B, E * (nfl + 1)]
 
@@ -198,40 +135,73 @@ def run_double(
                 g_embed
             )  # list with length N_mutations - used to make permutations
         final_embed = torch.stack(final_embed, dim=0)  # [2, B, E x (nfl + 1)]
+        assert final_embed.shape[0] == 2  # always double mutants here
+
+        # optionally run the stability head in half precision
+        autocast = torch.autocast(device, dtype=half_dtype) if half else nullcontext()
+        with autocast:
+            # do initial dim reduction
+            final_embed = model.light_attention(final_embed)  # [2, B, E]
+
+            # make two copies, one with AB order and other with BA order of mutation
+            embedAB = torch.cat((final_embed[0, :, :], final_embed[1, :, :]), dim=-1)
+            embedBA = torch.cat((final_embed[1, :, :], final_embed[0, :, :]), dim=-1)
+
+            # score both orders in one pass over a [2B, 2E] batch
+            ddg_cat = model.ddg_out(torch.cat([embedAB, embedBA], dim=0))
+            ddG_A, ddG_B = ddg_cat.chunk(2, dim=0)  # [B, 1] each
+
+        ddg = (ddG_A.float() + ddG_B.float()) / 2.0
+        return torch.squeeze(ddg, dim=-1)
+
+    if compile:  # fixed batch shape, so the whole head can be captured as one graph
+        predict_batch = torch.compile(predict_batch, mode="max-autotune", dynamic=False)
+    # torch.compiler is new in PyTorch 2.1; on 2.0 the per-batch clone below is enough
+    mark_step = getattr(
+        getattr(torch, "compiler", None), "cudagraph_mark_step_begin", None
+    )
 
-        # do initial dim reduction
-        final_embed = model.light_attention(final_embed)  # [2, B, E]
-
-        # if batch is only single mutations, pad it out with a "zero" mutation
-        if final_embed.shape[0] == 1:
-            zero_embed = torch.zeros(
-                final_embed.shape, dtype=torch.float32, device=E_idx.device
-            )
-            final_embed = torch.cat([final_embed, zero_embed], dim=0)
-
-        # make two copies, one with AB order and other with BA order of mutation
-        embedAB = torch.cat((final_embed[0, :, :], final_embed[1, :, :]), dim=-1)
-        embedBA = torch.cat((final_embed[1, :, :], final_embed[0, :, :]), dim=-1)
-
-        ddG_A = model.ddg_out(embedAB)  # [B, 1]
-        ddG_B = model.ddg_out(embedBA)  # [B, 1]
-
-        ddg = (ddG_A + ddG_B) / 2.0
-        preds += list(torch.squeeze(ddg, dim=-1).detach().cpu().numpy())
-    return np.squeeze(preds)
-
-
-class SSMDataset(torch.utils.data.Dataset):
-    def __init__(self, POS, WTAA, MUTAA):
-        self.POS = POS
-        self.WTAA = WTAA
-        self.MUTAA = MUTAA
+    preds = []
+    for b in tqdm(loader):
+        pos, mutAA = b
+        pos = pos.to(device)
+        mutAA = mutAA.to(device)
+        if compile:
+            # max-autotune replays CUDA graphs, which reuse their output buffers on the
+            # next call, so copy each batch out before it is overwritten
+            if mark_step is not None:
+                mark_step()
+            ddg = predict_batch(pos, mutAA).clone()
+        else:
+            ddg = predict_batch(pos, mutAA)
+        preds.append(ddg)  # stays on device until the end
+    if not preds:  # no pairs passed the distance filter
+        return np.zeros(0, dtype=np.float32)
+    # drop any rows the loader padded on
+    return torch.cat(preds)[: loader.n_real].cpu().numpy()
+
+
+class SSMBatchLoader:
+    """Slices batches of mutation tensors in the main process (no DataLoader workers)"""
+
+    def __init__(self, POS, MUTAA, batch_size, device="cuda", pad=False):
+        self.n_real = POS.shape[0]
+        self.batch_size = batch_size
+        tensors = (POS, MUTAA)
+        n_pad = -self.n_real % batch_size
+        if pad and self.n_real > 0 and n_pad > 0:
+            # repeat the last row up to a whole number of batches, so a compiled
+            # head sees one batch shape; run_double drops the extra rows
+            tensors = [torch.cat([t, t[-1:].expand(n_pad, -1)]) for t in tensors]
+        # copied to the device once, so batches are views with no per-batch transfer
+        self.tensors = [t.to(device) for t in tensors]
 
     def __len__(self):
-        return self.POS.shape[0]
+        return (self.tensors[0].shape[0] + self.batch_size - 1) // self.batch_size
 
-    def __getitem__(self, index):
-        return self.POS[index, :], self.WTAA[index, :], self.MUTAA[index, :]
+    def __iter__(self):
+        for i in range(0, self.tensors[0].shape[0], self.batch_size):
+            yield [t[i : i + self.batch_size] for t in self.tensors]
 
 
 def run_single_ssm(pdb, cfg, model):
@@ -298,35 +268,23 @@ def run_single_ssm(pdb, cfg, model):
     return ddg, S
 
 
-def expand_additive(ddg):
-    """Uses torch broadcasting to add all possible single mutants to each other in a vectorized operation."""
-    # ddg [L, 21]
-    dims = ddg.shape
-    ddgA = ddg.reshape(dims[0], dims[1], 1, 1)  # [L, 21, 1, 1]
-    ddgB = ddg.reshape(1, 1, dims[0], dims[1])  # [1, 1, L, 21]
-    ddg = ddgA + ddgB  # L, 21, L, 21
-
-    # mask out diagonal representing two mutations at the same position - this is invalid
-    for i in range(dims[0]):
-        ddg[i, :, i, :] = torch.nan
-
-    return ddg
+def format_mutations(wtAA, pos, mutAA):
+    """Vectorized mutation names (e.g. A12C) from wt/mut tokens and 0-indexed positions"""
+    ALPHABET = np.array(list("ACDEFGHIKLMNPQRSTVWYX"))
+    pos = (np.asarray(pos) + 1).astype(str)
+    return np.char.add(np.char.add(ALPHABET[np.asarray(wtAA)], pos), ALPHABET[mutAA])
 
 
 def format_output_single(ddg, S, threshold=-0.5):
     """Converts raw SSM predictions into nice format for analysis"""
-    ALPHABET = "ACDEFGHIKLMNPQRSTVWYX"
     ddg = ddg.cpu().detach().numpy()
     ddg = ddg[:, :20]
 
     keep_L, keep_AA = np.where(ddg <= threshold)
     ddg = ddg[ddg <= threshold]  # [N, ]
 
-    mutlist = []
-    for L_idx, AA_idx in tqdm(zip(keep_L, keep_AA)):
-        wtAA = ALPHABET[S[L_idx]]
-        mutAA = ALPHABET[AA_idx]
-        mutlist.append(wtAA + str(L_idx + 1) + mutAA)
+    S = torch.squeeze(S).cpu().numpy()
+    mutlist = format_mutations(S[keep_L], keep_L, keep_AA).tolist()
 
     return ddg, mutlist
 
@@ -334,36 +292,38 @@ def format_output_single(ddg, S, threshold=-0.5):
 def format_output_double(ddg, S, threshold, pdb, distance):
     """Converts raw SSM predictions into nice format for analysis"""
     stime = time.time()
-    ALPHABET = "ACDEFGHIKLMNPQRSTVWYX"
-    ddg = ddg.cpu().detach().numpy()  # [L, 21]
-    L, AA = ddg.shape
-
-    ddg = expand_additive(ddg)  # [L, 21, L, 21]
-    ddg = ddg[:, :20, :, :20]  # drop X predictions
+    ddg = ddg.detach()[:, :20]  # drop X predictions, [L, 20]
+    device = ddg.device
+    L = ddg.shape[0]
 
-    # Pre-mask matrix with distance constraints for speedup
+    # Pre-mask matrix with distance constraints (upper triangle only) for speedup
     dmat = get_dmat(pdb)
-    assert ddg.shape[0] == dmat.shape[0]
+    assert L == dmat.shape[0]
+    pair_mask = np.triu((dmat < distance) & (dmat != 0.0), k=1)  # [L, L]
+    p1s, p2s = torch.from_numpy(pair_mask).to(device).nonzero(as_tuple=True)  # [P]
+    S = torch.squeeze(S).to(device)
+    not_wt = torch.arange(20, device=device)[None, :] != S[:, None]  # [L, 20]
+
+    # additive ddgs only for the P nearby pairs rather than all of [L, 20, L, 20]
+    pair_ddg = ddg[p1s][:, :, None] + ddg[p2s][:, None, :]  # [P, 20, 20]
     valid_mask = (
-        (ddg <= threshold)
-        * (dmat < distance)[:, None, :, None]
-        * (dmat != 0.0)[:, None, :, None]
+        (pair_ddg <= threshold)
+        & not_wt[p1s][:, :, None]  # drop self-mutations
+        & not_wt[p2s][:, None, :]
     )
-    p1s, a1s, p2s, a2s = np.where(valid_mask)
+    pair_idx, a1s, a2s = valid_mask.nonzero(as_tuple=True)
+    p1s, p2s = p1s[pair_idx], p2s[pair_idx]
 
-    cond = p1s < p2s  # filter to keep only upper triangle
-    p1s, a1s, p2s, a2s = p1s[cond], a1s[cond], p2s[cond], a2s[cond]
-    wt_seq = [ALPHABET[S[ppp]] for ppp in np.arange(L)]
+    # keep the (p1, a1, p2, a2) order of the full expansion
+    order = torch.argsort(((p1s * 20 + a1s) * L + p2s) * 20 + a2s)
+    ddglist = pair_ddg[pair_idx, a1s, a2s][order].cpu().numpy()
 
-    mutlist, ddglist = [], []
-    for p1, a1, p2, a2 in tqdm(zip(p1s, a1s, p2s, a2s)):
-        wt1, wt2 = wt_seq[p1], wt_seq[p2]
-        mut1, mut2 = ALPHABET[a1], ALPHABET[a2]
-
-        if (wt1 != mut1) and (wt2 != mut2):  # drop self-mutations
-            mutation = f"{wt1}{p1 + 1}{mut1}:{wt2}{p2 + 1}{mut2}"
-            mutlist.append(mutation)
-            ddglist.append(ddg[p1, a1, p2, a2])
+    # only the surviving indices are transferred back for formatting
+    p1s, a1s, p2s, a2s = [idx[order].cpu().numpy() for idx in (p1s, a1s, p2s, a2s)]
+    S = S.cpu().numpy()
+    mut1 = format_mutations(S[p1s], p1s, a1s)
+    mut2 = format_mutations(S[p2s], p2s, a2s)
+    mutlist = np.char.add(np.char.add(mut1, ":"), mut2).tolist()
 
     etime = time.time()
     elapsed = etime - stime
@@ -376,24 +336,16 @@ def format_output_double(ddg, S, threshold, pdb, distance):
 def format_output_epistatic(ddg, S, pos, wtAA, mutAA, threshold=-0.5):
     "Converts raw SSM predictions into nice format for analysis."
     stime = time.time()
-    ALPHABET = "ACDEFGHIKLMNPQRSTVWYX"
-    S = torch.squeeze(S)
 
     # filter out ddgs that miss the threshold
     mask = ddg <= threshold
     ddg = ddg[mask]
-    wtAA = wtAA[mask, :]
-    mutAA = mutAA[mask, :]
-    pos = pos[mask, :]
-    mut_list = []
-    # a bunch of repeats in here?!
-    for b in tqdm(range(ddg.shape[0])):
-        w1 = ALPHABET[wtAA[b, 0]]
-        w2 = ALPHABET[wtAA[b, 1]]
-        m1 = ALPHABET[mutAA[b, 0]]
-        m2 = ALPHABET[mutAA[b, 1]]
-        mut_name = f"{w1}{pos[b, 0] + 1}{m1}:{w2}{pos[b, 1] + 1}{m2}"
-        mut_list.append(mut_name)
+    wtAA = np.asarray(wtAA)[mask, :]
+    mutAA = np.asarray(mutAA)[mask, :]
+    pos = np.asarray(pos)[mask, :]
+    mut1 = format_mutations(wtAA[:, 0], pos[:, 0], mutAA[:, 0])
+    mut2 = format_mutations(wtAA[:, 1], pos[:, 1], mutAA[:, 1])
+    mut_list = np.char.add(np.char.add(mut1, ":"), mut2).tolist()
     etime = time.time()
     elapsed = etime - stime
     print(
@@ -402,7 +354,9 @@ def format_output_epistatic(ddg, S, pos, wtAA, mutAA, threshold=-0.5):
     return ddg, mut_list
 
 
-def run_epistatic_ssm(pdb, cfg, model, distance, threshold, batch_size):
+def run_epistatic_ssm(
+    pdb, cfg, model, distance, threshold, batch_size, compile=False, half=False
+):
     """Run epistatic model on double mutations"""
 
     model.eval()
@@ -445,13 +399,24 @@ def run_epistatic_ssm(pdb, cfg, model, distance, threshold, batch_size):
         X, S, mask, chain_M, residue_idx, chain_encoding_all
     )
 
+    # neighbor lists for the edges between the two mutated residues, [1, L, K]
+    _, E_idx = _dist(X[:, :, 1, :], mask)
+
     # grab double mutation inputs
     MUT_POS, MUT_WT_AA, MUT_MUT_AA = get_ssm_mutations_double(pdb, distance)
-    dataset = SSMDataset(MUT_POS, MUT_WT_AA, MUT_MUT_AA)
-    loader = DataLoader(dataset, shuffle=False, batch_size=batch_size, num_workers=8)
+    loader = SSMBatchLoader(MUT_POS, MUT_MUT_AA, batch_size, device, pad=compile)
 
     preds = run_double(
-        all_mpnn_hid, mpnn_embed, cfg, loader, batch_size, model, X, mask, mpnn_edges
+        all_mpnn_hid,
+        mpnn_embed,
+        cfg,
+        loader,
+        batch_size,
+        model,
+        E_idx,
+        mpnn_edges,
+        compile=compile,
+        half=half,
     )
     ddg, mutations = format_output_epistatic(
         preds, S, MUT_POS, MUT_WT_AA, MUT_MUT_AA, threshold
@@ -492,7 +457,14 @@ def main(args):
 
     elif args.mode == "epistatic":
         ddg, mutations = run_epistatic_ssm(
-            pdb_data, cfg, model, args.distance, args.threshold, args.batch_size
+            pdb_data,
+            cfg,
+            model,
+            args.distance,
+            args.threshold,
+            args.batch_size,
+            compile=args.compile,
+            half=args.half_precision,
         )
 
     else:
@@ -575,4 +547,14 @@ if __name__ == "__main__":
         action="store_true",
         help="Add explicit disulfide breakage penalty. Default is False.",
     )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Compile the epistatic stability prediction head with torch.compile (requires PyTorch >= 2.0). Default is False.",
+    )
+    parser.add_argument(
+        "--half_precision",
+        action="store_true",
+        help="Run the epistatic stability prediction head in bfloat16/float16 autocast. Faster, but ddG values can drift slightly from fp32. Default is False.",
+    )
     main(parser.parse_args())